@@ -3,8 +3,11 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
+import json
 import random
 import re
+import urllib.request
+import uuid
 from textblob import TextBlob
 import altair as alt
 
@@ -67,6 +70,24 @@ if 'current_mood' not in st.session_state:
     st.session_state.current_mood = None
 if 'affirmation_count' not in st.session_state:
     st.session_state.affirmation_count = 0
+if 'mood_rollups' not in st.session_state:
+    st.session_state.mood_rollups = {'daily': {}, 'weekly': {}}
+if 'last_compaction' not in st.session_state:
+    st.session_state.last_compaction = None
+if 'mood_detector' not in st.session_state:
+    st.session_state.mood_detector = None
+if 'mood_alerts' not in st.session_state:
+    st.session_state.mood_alerts = []
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+if 'recommendation_stats' not in st.session_state:
+    st.session_state.recommendation_stats = {}
+if 'recommendation_rankings' not in st.session_state:
+    st.session_state.recommendation_rankings = {}
+if 'stale_rankings' not in st.session_state:
+    st.session_state.stale_rankings = set()
+if 'last_page' not in st.session_state:
+    st.session_state.last_page = None
 
 # Mood detection functions
 def detect_mood_from_text(text):
@@ -141,6 +162,219 @@ def get_mood_color(mood):
     }
     return mood_colors.get(mood, '#808080')
 
+# Retention functions
+# Raw check-ins are kept for raw_days, then rolled up into per-mood daily
+# counts; daily rollups older than daily_days are merged into weekly ones.
+# Rollups store one count per hour of day so hourly charts stay exact.
+RETENTION_POLICY = {
+    'raw_days': 90,
+    'daily_days': 365
+}
+
+def week_start(day):
+    """Get the Monday of the week containing day"""
+    return day - timedelta(days=day.weekday())
+
+def compact_mood_history(history, rollups, now, raw_days, daily_days, batch_days=None):
+    """Move expired raw entries into daily rollups and old daily rollups into weekly ones.
+
+    Whole days (and weeks) are recomputed and written before their source rows
+    are dropped, so an interrupted run can simply be repeated. batch_days limits
+    how many raw days one call compacts. Returns the remaining raw history.
+    """
+    raw_cutoff = (now - timedelta(days=raw_days)).date()
+    daily = {}
+    days = set()
+    end = len(history)
+    for i, entry in enumerate(history):
+        day = entry['timestamp'].date()
+        if day >= raw_cutoff or (batch_days and day not in days and len(days) >= batch_days):
+            end = i
+            break
+        days.add(day)
+        hours = daily.setdefault((day, entry['mood']), [0] * 24)
+        hours[entry['timestamp'].hour] += 1
+    rollups['daily'].update(daily)
+    history = history[end:]
+
+    weekly_cutoff = week_start((now - timedelta(days=max(daily_days, raw_days))).date())
+    if history:
+        weekly_cutoff = min(weekly_cutoff, week_start(history[0]['timestamp'].date()))
+    weekly = {}
+    expired = [key for key in rollups['daily'] if key[0] < weekly_cutoff]
+    for day, mood in expired:
+        hours = weekly.setdefault((week_start(day), mood), [0] * 24)
+        for hour, count in enumerate(rollups['daily'][(day, mood)]):
+            hours[hour] += count
+    rollups['weekly'].update(weekly)
+    for key in expired:
+        del rollups['daily'][key]
+    return history
+
+def run_compaction():
+    """Compact the stored mood history at most once a day"""
+    today = datetime.now().date()
+    if st.session_state.last_compaction == today:
+        return
+    st.session_state.mood_history = compact_mood_history(
+        st.session_state.mood_history, st.session_state.mood_rollups,
+        datetime.now(), **RETENTION_POLICY)
+    st.session_state.last_compaction = today
+
+def get_mood_counts(history, rollups):
+    """Combine raw entries and rollups into one date/hour/mood count table"""
+    columns = ['date', 'hour', 'mood', 'count']
+    rows = [
+        (day, hour, mood, count)
+        for tier in ('weekly', 'daily')
+        for (day, mood), hours in rollups[tier].items()
+        for hour, count in enumerate(hours) if count
+    ]
+    frames = [pd.DataFrame(rows, columns=columns)] if rows else []
+    if history:
+        df = pd.DataFrame(history, columns=['timestamp', 'mood'])
+        df['date'] = df['timestamp'].dt.date
+        df['hour'] = df['timestamp'].dt.hour
+        frames.append(df.groupby(['date', 'hour', 'mood']).size().reset_index(name='count'))
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(frames, ignore_index=True)
+
+# Alert functions
+# Valence per mood, used for the rolling EWMA and CUSUM drop detection.
+MOOD_VALENCE = {
+    'happy': 1.0,
+    'energetic': 0.6,
+    'calm': 0.5,
+    'tired': -0.4,
+    'anxious': -0.7,
+    'angry': -0.8,
+    'sad': -1.0
+}
+NEGATIVE_MOODS = {'sad', 'anxious', 'tired', 'angry'}
+DETECTOR_THRESHOLDS = {
+    'streak': 4,           # consecutive negative check-ins
+    'fast_alpha': 0.3,     # EWMA weight of the recent valence
+    'slow_alpha': 0.05,    # EWMA weight of the baseline valence
+    'drop': 1.0,           # baseline minus recent valence that counts as a sharp drop
+    'cusum_slack': 0.5,    # per-entry deviation below baseline that is ignored
+    'cusum_limit': 4.0,    # accumulated deviation that raises an alert
+    'warmup': 5            # entries before drop and CUSUM alerts are armed
+}
+
+def new_detector_state():
+    """Get an empty per-user detector state"""
+    return {'count': 0, 'streak': 0, 'fast': 0.0, 'slow': 0.0, 'cusum': 0.0,
+            'dropped': False, 'episode': False}
+
+def update_mood_detector(state, entry, thresholds=DETECTOR_THRESHOLDS):
+    """Fold one mood entry into the detector state in O(1) and return any new alerts.
+
+    Only the first alert of a low-mood episode is returned; the episode ends once
+    a non-negative check-in arrives and the recent valence is back near baseline.
+    """
+    mood = entry['mood']
+    valence = MOOD_VALENCE.get(mood, 0.0)
+    alerts = []
+
+    if mood in NEGATIVE_MOODS:
+        state['streak'] += 1
+        if state['streak'] == thresholds['streak']:
+            alerts.append(('streak', f"{state['streak']} negative check-ins in a row"))
+    else:
+        state['streak'] = 0
+
+    if state['count'] == 0:
+        state['fast'] = state['slow'] = valence
+    else:
+        baseline = state['slow']
+        state['cusum'] = max(0.0, state['cusum'] + baseline - valence - thresholds['cusum_slack'])
+        state['fast'] += thresholds['fast_alpha'] * (valence - state['fast'])
+        state['slow'] += thresholds['slow_alpha'] * (valence - baseline)
+        if state['count'] >= thresholds['warmup']:
+            gap = state['slow'] - state['fast']
+            if gap >= thresholds['drop'] and not state['dropped']:
+                state['dropped'] = True
+                alerts.append(('drop', "Your recent mood is well below your usual level"))
+            elif gap < thresholds['drop'] / 2:
+                state['dropped'] = False
+            if state['cusum'] >= thresholds['cusum_limit']:
+                state['cusum'] = 0.0
+                alerts.append(('cusum', "Your mood has been drifting downward"))
+    state['count'] += 1
+
+    if state['episode']:
+        if mood not in NEGATIVE_MOODS and not state['dropped']:
+            state['episode'] = False
+        return []
+    if not alerts:
+        return []
+    state['episode'] = True
+    return [
+        {'type': kind, 'message': message, 'mood': mood, 'timestamp': entry['timestamp']}
+        for kind, message in alerts[:1]
+    ]
+
+def replay_mood_history(entries, thresholds=DETECTOR_THRESHOLDS):
+    """Run the detector over a full history, e.g. to backtest thresholds.
+
+    Each returned alert also carries the index of the entry that raised it.
+    """
+    state = new_detector_state()
+    alerts = []
+    for index, entry in enumerate(entries):
+        new_alerts = update_mood_detector(state, entry, thresholds)
+        if new_alerts:
+            for alert in new_alerts:
+                alert['index'] = index
+            alerts.extend(new_alerts)
+    return alerts
+
+def file_alert_hook(path):
+    """Get a hook that appends each alert as a JSON line to path"""
+    def hook(alert):
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(alert, default=str) + '\n')
+    return hook
+
+def webhook_alert_hook(url, timeout=2):
+    """Get a hook that POSTs each alert as JSON to a local endpoint"""
+    def hook(alert):
+        request = urllib.request.Request(
+            url, data=json.dumps(alert, default=str).encode('utf-8'),
+            headers={'Content-Type': 'application/json'}, method='POST')
+        urllib.request.urlopen(request, timeout=timeout).close()
+    return hook
+
+# Called with every alert raised during check-in. Empty by default so alerts
+# stay in the app; opt in with e.g. file_alert_hook('mood_alerts.jsonl') or
+# webhook_alert_hook('http://localhost:8000/alerts').
+ALERT_HOOKS = []
+
+def dispatch_alerts(alerts):
+    """Show alerts in the app and pass them to every alert hook"""
+    st.session_state.mood_alerts.extend(alerts)
+    for alert in alerts:
+        alert = dict(alert, session_id=st.session_state.session_id)
+        for hook in ALERT_HOOKS:
+            try:
+                hook(alert)
+            except Exception as e:
+                st.warning(f"Alert hook failed: {e}")
+
+def alert_banner():
+    """Show the latest undismissed mood alert"""
+    if not st.session_state.mood_alerts:
+        return
+    alert = st.session_state.mood_alerts[-1]
+    col1, col2 = st.columns([5, 1])
+    with col1:
+        st.warning(f"💙 {alert['message']}. Consider a break, a breathing exercise from the Wellness Library, or reaching out to someone you trust.")
+    with col2:
+        if st.button("Dismiss", key="dismiss_alert"):
+            st.session_state.mood_alerts = []
+            st.rerun()
+
 # Recommendation functions
 def get_affirmations(mood):
     """Get mood-specific affirmations"""
@@ -398,6 +632,75 @@ def get_music_recommendations(mood):
     }
     return music.get(mood, music['calm'])
 
+# Personalized ranking functions
+# Beta(alpha, beta) pseudo-counts added per feedback event. Explicit ratings
+# count fully; playing a track in the embedded YouTube player is a weaker
+# implicit signal. Plain links expose no click event, so direct YouTube
+# click-throughs are not counted.
+FEEDBACK_REWARDS = {
+    'helped': (1.0, 0.0),
+    'not_helped': (0.0, 1.0),
+    'play': (0.5, 0.0)
+}
+
+def get_recommendation_catalogue(kind, mood):
+    """Get the unranked items and their ids for a recommendation type"""
+    if kind == 'music':
+        return [(song['title'], song) for song in get_music_recommendations(mood)]
+    return [(activity, activity) for activity in get_activities(mood)]
+
+def rerank_recommendations(kind, mood):
+    """Draw a Thompson sample per item and store the resulting order"""
+    stats = st.session_state.recommendation_stats.get((kind, mood), {})
+    samples = {
+        item_id: random.betavariate(*stats.get(item_id, (1.0, 1.0)))
+        for item_id, _ in get_recommendation_catalogue(kind, mood)
+    }
+    ordered = sorted(samples, key=samples.get, reverse=True)
+    st.session_state.recommendation_rankings[(kind, mood)] = {
+        item_id: rank for rank, item_id in enumerate(ordered)
+    }
+
+def record_recommendation_feedback(kind, mood, item_id, event):
+    """Update the per-user bandit with one feedback event"""
+    stats = st.session_state.recommendation_stats.setdefault((kind, mood), {})
+    alpha, beta = stats.get(item_id, (1.0, 1.0))
+    reward, penalty = FEEDBACK_REWARDS[event]
+    stats[item_id] = (alpha + reward, beta + penalty)
+    st.session_state.stale_rankings.add((kind, mood))
+
+def refresh_stale_rankings():
+    """Rerank every list that received feedback since it was last ordered"""
+    for kind, mood in st.session_state.stale_rankings:
+        rerank_recommendations(kind, mood)
+    st.session_state.stale_rankings = set()
+
+def get_ranked_recommendations(kind, mood):
+    """Get recommendations in the user's precomputed order"""
+    catalogue = get_recommendation_catalogue(kind, mood)
+    ranking = st.session_state.recommendation_rankings.get((kind, mood))
+    if ranking:
+        catalogue.sort(key=lambda entry: ranking.get(entry[0], len(ranking)))
+    return [item for _, item in catalogue]
+
+def record_music_play(mood):
+    """Count a track chosen in the embedded player as a play"""
+    selected_song = st.session_state.get('music_selector')
+    if selected_song:
+        record_recommendation_feedback('music', mood, selected_song, 'play')
+
+def feedback_buttons(kind, mood, item_id, key):
+    """Render helped / didn't help buttons for a recommendation"""
+    col1, col2 = st.columns(2)
+    with col1:
+        st.button("👍 Helped", key=f"helped_{key}",
+                  on_click=record_recommendation_feedback,
+                  args=(kind, mood, item_id, 'helped'))
+    with col2:
+        st.button("👎 Didn't help", key=f"not_helped_{key}",
+                  on_click=record_recommendation_feedback,
+                  args=(kind, mood, item_id, 'not_helped'))
+
 # Main app
 def main():
     # Header
@@ -406,11 +709,23 @@ def main():
     st.markdown("### Your AI-powered wellness companion for mental health and productivity")
     st.markdown('</div>', unsafe_allow_html=True)
 
+    # Filled after the page runs so alerts from this check-in show immediately
+    banner = st.container()
+
+    # Roll old check-ins up before any page reads the history
+    run_compaction()
+
     # Sidebar
     st.sidebar.markdown("## 🎯 Navigation")
     page = st.sidebar.selectbox("Choose a section:", 
         ["🏠 Mood Check-in", "📊 Mood Analytics", "💡 Recommendations", "📚 Wellness Library"])
 
+    # Apply feedback to the ranking when a page is entered, not while the
+    # user is clicking through the current list
+    if page != st.session_state.last_page:
+        refresh_stale_rankings()
+        st.session_state.last_page = page
+
     if page == "🏠 Mood Check-in":
         mood_checkin()
     elif page == "📊 Mood Analytics":
@@ -420,6 +735,9 @@ def main():
     elif page == "📚 Wellness Library":
         wellness_library()
 
+    with banner:
+        alert_banner()
+
 def mood_checkin():
     st.header("🌟 How are you feeling today?")
     
@@ -471,6 +789,11 @@ def mood_checkin():
             }
             st.session_state.mood_history.append(mood_entry)
             
+            # Stream the new entry through the negative-mood detector
+            if st.session_state.mood_detector is None:
+                st.session_state.mood_detector = new_detector_state()
+            dispatch_alerts(update_mood_detector(st.session_state.mood_detector, mood_entry))
+            
             st.success(f"Mood detected: {get_mood_emoji(detected_mood)} {detected_mood.title()}")
         else:
             st.warning("Please enter some text to analyze your mood!")
@@ -502,18 +825,17 @@ def mood_checkin():
 def mood_analytics():
     st.header("📊 Mood Analytics & Insights")
     
-    if not st.session_state.mood_history:
+    rollups = st.session_state.mood_rollups
+    if not (st.session_state.mood_history or rollups['daily'] or rollups['weekly']):
         st.info("No mood data yet. Start by checking in with your mood!")
         return
     
-    # Convert to DataFrame
-    df = pd.DataFrame(st.session_state.mood_history)
-    df['date'] = df['timestamp'].dt.date
-    df['hour'] = df['timestamp'].dt.hour
+    # Raw entries and compacted rollups as one count table
+    counts = get_mood_counts(st.session_state.mood_history, rollups)
     
     # Mood distribution
     st.subheader("📈 Mood Distribution")
-    mood_counts = df['mood'].value_counts()
+    mood_counts = counts.groupby('mood')['count'].sum()
     
     fig = px.pie(values=mood_counts.values, names=mood_counts.index, 
                  title="Overall Mood Distribution")
@@ -521,15 +843,22 @@ def mood_analytics():
     
     # Mood over time
     st.subheader("📅 Mood Timeline")
-    daily_mood = df.groupby(['date', 'mood']).size().reset_index(name='count')
+    # Once weekly rollups exist, bucket every tier by week so the whole series shares one scale
+    if rollups['weekly']:
+        timeline = counts.assign(date=counts['date'].map(week_start))
+        title = "Weekly Mood Trends Over Time"
+    else:
+        timeline = counts
+        title = "Mood Trends Over Time"
+    daily_mood = timeline.groupby(['date', 'mood'])['count'].sum().reset_index()
     
     fig = px.line(daily_mood, x='date', y='count', color='mood',
-                  title="Mood Trends Over Time")
+                  title=title)
     st.plotly_chart(fig, use_container_width=True)
     
     # Mood by time of day
     st.subheader("🕐 Mood by Time of Day")
-    hourly_mood = df.groupby(['hour', 'mood']).size().reset_index(name='count')
+    hourly_mood = counts.groupby(['hour', 'mood'])['count'].sum().reset_index()
     
     fig = px.bar(hourly_mood, x='hour', y='count', color='mood',
                  title="Mood Patterns by Hour")
@@ -537,7 +866,11 @@ def mood_analytics():
     
     # Recent mood entries
     st.subheader("📝 Recent Mood Entries")
-    recent_entries = df.tail(10).sort_values('timestamp', ascending=False)
+    if not st.session_state.mood_history:
+        st.info("No recent check-ins; older entries have been compacted into summaries.")
+        return
+    df = pd.DataFrame(st.session_state.mood_history[-10:])
+    recent_entries = df.sort_values('timestamp', ascending=False)
     
     for _, entry in recent_entries.iterrows():
         st.markdown(f"""
@@ -564,17 +897,18 @@ def recommendations_page():
     
     with tab1:
         st.subheader("🎯 Recommended Activities")
-        activities = get_activities(mood)
-        for activity in activities:
+        activities = get_ranked_recommendations('activities', mood)
+        for i, activity in enumerate(activities):
             st.markdown(f"""
             <div class="activity-card">
                 {activity}
             </div>
             """, unsafe_allow_html=True)
+            feedback_buttons('activities', mood, activity, f"activity_{mood}_{i}")
     
     with tab2:
         st.subheader("🎵 Music Recommendations")
-        music = get_music_recommendations(mood)
+        music = get_ranked_recommendations('music', mood)
         
         # Add music player functionality
         st.markdown("### 🎧 Click to play music:")
@@ -589,6 +923,7 @@ def recommendations_page():
                     <em>{song['description']}</em>
                 </div>
                 """, unsafe_allow_html=True)
+                feedback_buttons('music', mood, song['title'], f"music_{mood}_{i}")
             
             with col2:
                 # Audio player for sample sounds
@@ -609,15 +944,19 @@ def recommendations_page():
         st.markdown("---")
         st.subheader("🎼 Embedded Music Player")
         
-        # Create a simple music player with pre-selected tracks
+        # Create a simple music player with pre-selected tracks, kept in
+        # catalogue order so feedback never reorders the options
+        catalogue = get_music_recommendations(mood)
         selected_song = st.selectbox(
-            "Choose a song to play:",
-            options=[song['title'] for song in music],
-            key="music_selector"
+            "Choose a song to play (plays count as feedback):",
+            options=[song['title'] for song in catalogue],
+            key="music_selector",
+            on_change=record_music_play,
+            args=(mood,)
         )
         
         if selected_song:
-            selected_track = next(song for song in music if song['title'] == selected_song)
+            selected_track = next(song for song in catalogue if song['title'] == selected_song)
             
             # Show YouTube embed (Note: This requires the video to allow embedding)
             st.markdown("### 🎵 Now Playing:")
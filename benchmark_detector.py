@@ -0,0 +1,85 @@
+"""Benchmark replaying mood history through the negative-mood detector.
+
+Generates a synthetic stream of check-ins with occasional low stretches,
+replays it with replay_mood_history and reports throughput, alerts of each
+type, how many alerts fell inside a low stretch and how many sustained low
+stretches were caught, so thresholds can be backtested from the command line.
+
+    python benchmark_detector.py --entries 2000000 --streak 4 --drop 0.6
+"""
+import argparse
+import random
+import time
+from collections import Counter
+from datetime import datetime
+
+from app import DETECTOR_THRESHOLDS, MOOD_VALENCE, replay_mood_history
+
+POSITIVE = ['happy', 'energetic', 'calm']
+NEGATIVE = ['sad', 'anxious', 'tired', 'angry']
+
+
+def synthetic_stream(entries, low_chance):
+    """Generate check-ins that mostly stay positive with occasional low stretches.
+
+    Returns the stream and the (start, end) index range of every low stretch.
+    """
+    rng = random.Random(0)
+    timestamp = datetime.now()
+    # Entries are shared per mood to keep millions of them in memory cheaply
+    pool = {mood: {'timestamp': timestamp, 'mood': mood} for mood in MOOD_VALENCE}
+    stream = []
+    stretches = []
+    low = 0
+    for index in range(entries):
+        if low == 0 and rng.random() < low_chance:
+            low = rng.randint(2, 8)
+            stretches.append((index, min(index + low, entries)))
+        if low:
+            low -= 1
+            mood = rng.choice(NEGATIVE) if rng.random() < 0.8 else rng.choice(POSITIVE)
+        else:
+            mood = rng.choice(POSITIVE) if rng.random() < 0.75 else rng.choice(NEGATIVE)
+        stream.append(pool[mood])
+    return stream, stretches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--entries', type=int, default=2_000_000)
+    parser.add_argument('--low-chance', type=float, default=0.02)
+    parser.add_argument('--sustained', type=int, default=5,
+                        help='low stretches at least this long should raise an alert')
+    for name, value in DETECTOR_THRESHOLDS.items():
+        parser.add_argument('--' + name.replace('_', '-'), type=type(value), default=value)
+    args = parser.parse_args()
+    thresholds = {name: getattr(args, name) for name in DETECTOR_THRESHOLDS}
+
+    stream, stretches = synthetic_stream(args.entries, args.low_chance)
+
+    start = time.perf_counter()
+    alerts = replay_mood_history(stream, thresholds)
+    elapsed = time.perf_counter() - start
+
+    print(f"thresholds {thresholds}")
+    print(f"replayed {len(stream):,} entries in {elapsed:.2f}s "
+          f"({len(stream) / elapsed:,.0f} entries/s)")
+    for kind, count in sorted(Counter(alert['type'] for alert in alerts).items()):
+        print(f"  {kind:8}{count:>10,} alerts ({count * 1000 / len(stream):.2f} per 1k entries)")
+
+    in_low = bytearray(len(stream))
+    for start, end in stretches:
+        in_low[start:end] = b'\x01' * (end - start)
+    alerted = bytearray(len(stream))
+    for alert in alerts:
+        alerted[alert['index']] = 1
+    sustained = [(start, end) for start, end in stretches if end - start >= args.sustained]
+    caught = sum(1 for start, end in sustained if any(alerted[start:end]))
+    inside = sum(1 for alert in alerts if in_low[alert['index']])
+    print(f"  {inside / max(len(alerts), 1):.0%} of alerts fell inside a low stretch; "
+          f"{caught / max(len(sustained), 1):.0%} of {len(sustained):,} low stretches "
+          f"of {args.sustained}+ entries raised an alert")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""Benchmark storage size and analytics query time before and after compaction.
+
+Builds a synthetic multi-year mood history, measures the pickled size of the
+stored data and the time taken by the mood_analytics aggregations, then runs
+compact_mood_history and measures again.
+
+    python benchmark_retention.py --years 5 --per-day 6
+"""
+import argparse
+import pickle
+import random
+import time
+from datetime import datetime, timedelta
+
+from app import RETENTION_POLICY, compact_mood_history, get_mood_counts
+
+MOODS = ['happy', 'sad', 'anxious', 'angry', 'calm', 'energetic', 'tired']
+SAMPLE_TEXT = ("Work was busy today but I managed to finish the report, "
+               "went for a short walk after lunch and called a friend in the evening. "
+               "Check-in {}.")
+
+
+def synthetic_history(years, per_day, now):
+    """Generate per_day check-ins a day for the given number of years"""
+    rng = random.Random(0)
+    start = now - timedelta(days=365 * years)
+    history = []
+    # Every row gets its own text so pickle cannot share one string across the history
+    for day in range(365 * years):
+        base = start + timedelta(days=day)
+        for hour in sorted(rng.sample(range(7, 23), per_day)):
+            mood = rng.choice(MOODS)
+            history.append({
+                'timestamp': base.replace(hour=hour, minute=rng.randrange(60)),
+                'mood': mood,
+                'text': SAMPLE_TEXT.format(len(history)),
+                'emoji': mood
+            })
+    return history
+
+
+def storage_bytes(history, rollups):
+    """Pickled size of everything the app keeps for mood history"""
+    return len(pickle.dumps((history, rollups), protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def query_seconds(history, rollups, repeats):
+    """Best time to run the mood_analytics aggregations"""
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        counts = get_mood_counts(history, rollups)
+        counts.groupby('mood')['count'].sum()
+        counts.groupby(['date', 'mood'])['count'].sum()
+        counts.groupby(['hour', 'mood'])['count'].sum()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--years', type=int, default=5)
+    parser.add_argument('--per-day', type=int, default=6)
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+
+    now = datetime.now().replace(minute=0, second=0, microsecond=0)
+    history = synthetic_history(args.years, args.per_day, now)
+    rollups = {'daily': {}, 'weekly': {}}
+
+    before_size = storage_bytes(history, rollups)
+    before_query = query_seconds(history, rollups, args.repeats)
+    before_totals = get_mood_counts(history, rollups).groupby('mood')['count'].sum()
+
+    start = time.perf_counter()
+    history = compact_mood_history(history, rollups, now, **RETENTION_POLICY)
+    compaction = time.perf_counter() - start
+
+    after_size = storage_bytes(history, rollups)
+    after_query = query_seconds(history, rollups, args.repeats)
+    after_totals = get_mood_counts(history, rollups).groupby('mood')['count'].sum()
+    assert before_totals.equals(after_totals), "compaction changed mood totals"
+
+    print(f"{args.years} years, {args.per_day} check-ins/day, policy {RETENTION_POLICY}")
+    print(f"{'':12}{'raw rows':>10}{'daily':>8}{'weekly':>8}{'storage':>12}{'query':>10}")
+    print(f"{'before':12}{sum(before_totals):>10}{0:>8}{0:>8}"
+          f"{before_size / 1024:>10.0f}KB{before_query * 1000:>8.1f}ms")
+    print(f"{'after':12}{len(history):>10}{len(rollups['daily']):>8}{len(rollups['weekly']):>8}"
+          f"{after_size / 1024:>10.0f}KB{after_query * 1000:>8.1f}ms")
+    print(f"compaction took {compaction * 1000:.1f}ms")
+
+
+if __name__ == '__main__':
+    main()